@@ -0,0 +1,188 @@
+import sqlite3
+import threading
+
+import pandas as pd
+import pytest
+
+import toastmetrics_app as app
+
+MENU_HEADER = "Sales Category,Item Name,Avg Price,Quantity,Gross Sales,Discount Amount,Net Sales\n"
+
+
+def write_menu_csv(folder, rows, name="menu-breakdown-test.csv"):
+    path = folder / name
+    path.write_text(MENU_HEADER + "".join(row + "\n" for row in rows))
+    return path
+
+
+def test_pyarrow_read_with_blank_cells(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    # Route the small test file through the pyarrow engine
+    monkeypatch.setattr(app, "PYARROW_MIN_BYTES", 0)
+    write_menu_csv(tmp_path, ["Food,Salad,25,1,25,,25", "Food,Soup,5,1,5,0,5"])
+
+    df = app.load_all_weeks(str(tmp_path), cache=False)
+
+    assert sorted(df["Item Name"]) == ["Salad", "Soup"]
+    assert isinstance(df["Item Name"].dtype, pd.CategoricalDtype)
+    assert df.loc[df["Item Name"] == "Soup", "Net Sales"].item() == 5
+
+
+def test_damaged_parquet_cache_is_rebuilt(tmp_path):
+    pytest.importorskip("pyarrow")
+    write_menu_csv(tmp_path, ["Food,Salad,25,1,25,0,25"])
+    expected = app.load_all_weeks(str(tmp_path))
+
+    # Simulate a run killed mid-write: a truncated cache newer than the CSV
+    cache_path = tmp_path / "menu-breakdown-test.parquet"
+    cache_path.write_bytes(cache_path.read_bytes()[:20])
+
+    pd.testing.assert_frame_equal(app.load_all_weeks(str(tmp_path)), expected)
+    pd.testing.assert_frame_equal(pd.read_parquet(cache_path), expected.drop(columns="Week"))
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_aggregate_items_keeps_missing_values():
+    df = pd.DataFrame({
+        "Sales Category": ["Food", "Food", "Food", "Food", "Food"],
+        "Item Name": ["Salad", "Soup", "Soup", "Wrap", "Wrap"],
+        "Avg Price": [9.0, 2.0, 4.0, 5.0, 7.0],
+        "Quantity": [float("nan"), 1.0, 3.0, 2.0, float("nan")],
+        "Net Sales": [float("nan"), 1.0, 2.0, 10.0, 7.0],
+    })
+
+    out = app.aggregate_items(df).set_index("Item Name")
+
+    # An unmerged row keeps its missing values instead of summing to 0
+    assert out.loc["Salad", ["Quantity", "Net Sales"]].isna().all()
+    assert out.loc["Salad", "Avg Price"] == 9.0
+    # Merged rows get a quantity-weighted price only when every quantity is present
+    assert out.loc["Soup", "Avg Price"] == 3.5
+    assert out.loc["Wrap", "Avg Price"] == 6.0
+
+
+@pytest.mark.parametrize("min_bytes", [None, 0])
+def test_header_spaces_stripped_values_kept(tmp_path, monkeypatch, min_bytes):
+    if min_bytes is not None:
+        pytest.importorskip("pyarrow")
+        monkeypatch.setattr(app, "PYARROW_MIN_BYTES", min_bytes)
+    (tmp_path / "menu-breakdown-test.csv").write_text(
+        " Sales Category, Item Name ,Quantity\nDrinks, Wine,1\nDrinks,Wine,2\n"
+    )
+
+    df = app.load_all_weeks(str(tmp_path), cache=False)
+
+    # Both CSV engines strip header names only, so the two rows stay separate items
+    assert sorted(df["Item Name"]) == [" Wine", "Wine"]
+
+
+def test_item_reports_accept_rows_or_totals():
+    rows = pd.DataFrame({
+        "Item Name": ["Salad", "Soup", "Salad"],
+        "Quantity": [1.0, 3.0, 4.0],
+        "Net Sales": [10.0, 6.0, 40.0],
+    })
+    totals = app.summarize_items(rows)
+
+    for df, is_totals in ((rows, False), (totals, True)):
+        assert app.top_items_by_quantity(df, n=1, totals=is_totals).values.tolist() == [["Salad", 5.0]]
+        assert app.top_items_by_revenue(df, n=1, totals=is_totals).values.tolist() == [["Salad", 50.0]]
+        assert app.bottom_items_by_quantity(df, n=1, totals=is_totals).values.tolist() == [["Soup", 3.0]]
+
+
+def test_bottom_items_skip_all_missing_quantity():
+    nan = float("nan")
+    unique = pd.DataFrame({"Item Name": ["Soup", "Salad", "Wrap"], "Quantity": [nan, 2.0, 3.0], "Net Sales": [nan, 1.0, 1.0]})
+    repeated = pd.concat([unique, unique.tail(1)], ignore_index=True)
+
+    # An item with no recorded quantity is not a bottom performer, whatever else is in the data
+    for df in (unique, repeated):
+        assert app.bottom_items_by_quantity(df, n=1)["Item Name"].tolist() == ["Salad"]
+
+
+@pytest.mark.parametrize("min_bytes", [None, 0])
+def test_header_only_week_next_to_normal_week(tmp_path, monkeypatch, min_bytes):
+    if min_bytes is not None:
+        pytest.importorskip("pyarrow")
+        monkeypatch.setattr(app, "PYARROW_MIN_BYTES", min_bytes)
+    write_menu_csv(tmp_path, [], name="menu-breakdown-empty.csv")
+    write_menu_csv(tmp_path, ["Food,Salad,5,1,5,0,5"])
+
+    df = app.load_all_weeks(str(tmp_path), cache=False)
+
+    assert df["Item Name"].tolist() == ["Salad"]
+    assert pd.api.types.is_numeric_dtype(df["Quantity"])
+
+
+def test_sql_reports_match_pandas_reports(tmp_path):
+    nan = float("nan")
+    rows = pd.DataFrame({
+        "Sales Category": ["Food", "Food", "Food", "Food", "Drinks"],
+        "Item Name": ["Soup", "Salad", "Wrap", "Wrap", "Wine"],
+        "Quantity": [nan, 2.0, 3.0, 1.0, 7.0],
+        "Net Sales": [nan, 20.0, 15.0, 5.0, 70.0],
+    })
+    db_path = str(tmp_path / "test.db")
+    app.save_to_database(rows, db_path)
+
+    sql = list(app.run_sql_reports(db_path, n=2).values())
+    expected = [
+        app.top_items_by_quantity(rows, n=2),
+        app.top_items_by_revenue(rows, n=2),
+        app.bottom_items_by_quantity(rows, n=2),
+        app.bottom_items_by_category(rows, "Food", n=2),
+    ]
+    for got, want in zip(sql, expected):
+        pd.testing.assert_frame_equal(got, want.reset_index(drop=True), check_dtype=False)
+
+
+def test_database_helpers_from_other_threads(tmp_path):
+    rows = pd.DataFrame({"Item Name": ["Salad"], "Quantity": [2.0], "Net Sales": [20.0]})
+    db_path = str(tmp_path / "test.db")
+    app.save_to_database(rows, db_path)
+    results, errors = [], []
+
+    def worker():
+        try:
+            app.save_to_database(rows, db_path)
+            results.append(app.query_database("SELECT COUNT(*) AS n FROM sales", db_path)["n"].item())
+        except Exception as exc:
+            errors.append(exc)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+
+    assert errors == []
+    assert results == [1]
+
+
+def test_query_leaves_journal_mode_alone(tmp_path):
+    db_path = str(tmp_path / "plain.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE sales (x)")
+
+    app.query_database("SELECT * FROM sales", db_path)
+
+    assert app.query_database("PRAGMA journal_mode", db_path).iloc[0, 0] == "delete"
+
+
+def test_chunked_load_matches_whole_file_load(tmp_path):
+    write_menu_csv(tmp_path, [
+        "Food,Soup,2,1,2,0,2",
+        "Food,Soup,4,,4,0,4",
+        "Food,Soup,10,3,30,0,30",
+        "Food,Salad,5,2,10,0,10",
+        "Food,Salad,7,1,7,0,7",
+    ])
+
+    whole = app.load_all_weeks(str(tmp_path), cache=False)
+    for chunksize in (1, 2, 3):
+        chunked = app.load_all_weeks(str(tmp_path), chunksize=chunksize, cache=False)
+        pd.testing.assert_frame_equal(
+            chunked.sort_values("Item Name", ignore_index=True),
+            whole.sort_values("Item Name", ignore_index=True),
+            check_dtype=False,
+        )
+    # A blank quantity among merged Soup rows falls back to the mean price
+    assert whole.set_index("Item Name").loc["Soup", "Avg Price"] == pytest.approx(16 / 3)
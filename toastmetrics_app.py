@@ -2,28 +2,78 @@
 #            ToastMetrics Application
 #=======================================================
 
+import importlib.util
 import os
+import re
+import tempfile
+import threading
+import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
 import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+
+
+# Columns used by the reports and the database; everything else is skipped at read time
+MENU_COLUMNS = ["Sales Category", "Item Name", "Avg Price", "Quantity", "Gross Sales", "Discount Amount", "Net Sales"]
+
+# Text columns kept as categories, so groupbys hash small integer codes instead of strings
+CATEGORY_COLUMNS = ["Item Name", "Sales Category"]
+
+# Known text columns, so read_csv skips type inference for them
+MENU_DTYPES = {col: "category" for col in CATEGORY_COLUMNS}
+
+# Additive columns that can be pre-summed per file
+SUM_COLUMNS = ["Quantity", "Gross Sales", "Discount Amount", "Net Sales"]
+
+# pyarrow is optional; its multi-threaded CSV reader only pays off on larger exports
+_HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+PYARROW_MIN_BYTES = 1024 * 1024
+
+if _HAS_PYARROW:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+
+# Toast export file names, e.g. "menu-breakdown-dec-1-7-2025.csv" (any case)
+_MENU_CSV_NAME = re.compile(r"menu-breakdown.*\.csv\Z", re.IGNORECASE | re.DOTALL)
 
 
 def find_menu_csvs_in_folder(folder_path):
     """Return all menu-breakdown CSVs inside a folder."""
-    hits = []
-    for file in os.listdir(folder_path):
-        f = file.lower()
-        if "menu-breakdown" in f and f.endswith(".csv"):
-            hits.append(os.path.join(folder_path, file))
-    return hits
+    # scandir entries carry the file type, so no extra stat() per file
+    with os.scandir(folder_path) as entries:
+        return [
+            entry.path for entry in entries
+            if _MENU_CSV_NAME.search(entry.name) and entry.is_file()
+        ]
 
 
 def find_week_folders(base_path):
     """Subfolders under base_path."""
-    return [
-        os.path.join(base_path, name)
-        for name in os.listdir(base_path)
-        if os.path.isdir(os.path.join(base_path, name))
-    ]
+    with os.scandir(base_path) as entries:
+        return [entry.path for entry in entries if entry.is_dir()]
+
+
+# Thousands separators and currency signs in Toast exports
+_CURRENCY_CHARS = re.compile(r"[,$]")
+
+
+def _to_number(col: pd.Series) -> pd.Series:
+    """Strip commas and $ in one regex pass, then convert to numbers."""
+    if _HAS_PYARROW:
+        # Compiled Arrow kernels: one pass over the string buffer, straight into float64.
+        # Cells Arrow cannot parse (blanks, stray text) fall back to to_numeric's coercion.
+        try:
+            text = pa.array(col, type=pa.string(), from_pandas=True)
+            cleaned = pc.replace_substring_regex(text, _CURRENCY_CHARS.pattern, "")
+            values = pc.cast(cleaned, pa.float64()).to_numpy(zero_copy_only=False)
+            return pd.Series(values, index=col.index, name=col.name)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            pass
+
+    return pd.to_numeric(col.astype(str).str.replace(_CURRENCY_CHARS, "", regex=True), errors="coerce")
 
 
 # convert to string
@@ -31,71 +81,288 @@ def find_week_folders(base_path):
 # then to_numeric
 def normalize_menu_df(df: pd.DataFrame) -> pd.DataFrame:
     """Normalize menu-breakdown DataFrame columns."""
-    df.columns = df.columns.str.strip()
+    # Toast headers are normally clean, so only build a new column Index when one isn't
+    if any(col != col.strip() for col in df.columns):
+        df = df.rename(columns=str.strip)
     num_cols = ["Avg Price", "Quantity", "Gross Sales", "Discount Amount", "Net Sales"]
-    for col in num_cols:
-        if col in df.columns:
-            df[col] = df[col].astype(str).str.replace(",", "").str.replace("$", "")
-            df[col] = pd.to_numeric(df[col], errors="coerce")
+    # Columns the CSV parser already read as numbers need no string cleanup
+    present = [
+        col for col in num_cols
+        if col in df.columns and not pd.api.types.is_numeric_dtype(df[col])
+    ]
+    if present:
+        df[present] = df[present].apply(_to_number)
+
+    for col in CATEGORY_COLUMNS:
+        if col not in df.columns:
+            continue
+        if not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+        # Header-only or all-blank columns come back with float or object categories;
+        # make them text so .str and union_categoricals work across every file
+        categories = df[col].cat.categories
+        if len(categories) == 0 or not pd.api.types.is_string_dtype(categories):
+            df[col] = df[col].cat.rename_categories(categories.astype(str))
 
     return df
 
 
-def load_all_weeks(base_path):
-    """Load all menu-breakdown CSVs from week subfolders."""
-    
-    all_dfs = []
+def read_menu_csv(csv_path, chunksize=None):
+    """Read the used columns of one menu-breakdown CSV.
 
-    # Load any menu-breakdown CSVs directly in base_path
-    for csv_path in find_menu_csvs_in_folder(base_path):
-        df = pd.read_csv(csv_path)
-        df = normalize_menu_df(df)
-        df["Week"] = os.path.splitext(os.path.basename(csv_path))[0]  # filename as label
-        all_dfs.append(df)
+    With chunksize, return an iterator of DataFrames of that many rows instead.
+    """
+    # The pyarrow engine cannot read in chunks
+    if chunksize is None and _HAS_PYARROW and os.path.getsize(csv_path) >= PYARROW_MIN_BYTES:
+        # The pyarrow engine needs exact column names, so match them against the header.
+        # No dtype here: with it, pandas casts blank cells in integer-looking columns and
+        # fails; normalize_menu_df does the category cast instead.
+        header = pd.read_csv(csv_path, nrows=0).columns
+        usecols = [c for c in header if c.strip() in MENU_COLUMNS]
+        return pd.read_csv(csv_path, engine="pyarrow", usecols=usecols)
+
+    return pd.read_csv(
+        csv_path,
+        usecols=lambda c: c.strip() in MENU_COLUMNS,
+        dtype=MENU_DTYPES,
+        chunksize=chunksize,
+    )
+
+
+def drop_total_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Drop summary rows (e.g. "Food Total") from a menu-breakdown DataFrame."""
+    names = df["Item Name"]
+    if isinstance(names.dtype, pd.CategoricalDtype):
+        # Match once per distinct name, then map back to rows through the codes;
+        # the appended False covers code -1 (missing name)
+        is_total = np.asarray(names.cat.categories.str.contains("total", case=False, na=False))
+        mask = np.append(is_total, False)[names.cat.codes.to_numpy()]
+    else:
+        mask = names.str.contains("total", case=False, na=False).to_numpy()
+    return df[~mask]
+
+
+def _sum_by_item(df: pd.DataFrame) -> pd.DataFrame:
+    """Group rows by item and sum every other column."""
+    keys = [c for c in ("Item Name", "Sales Category") if c in df.columns]
+    values = [c for c in df.columns if c not in keys]
+    # min_count=1 keeps an all-missing group missing instead of summing it to 0
+    grouped = df.groupby(keys, sort=False, observed=True, dropna=False)
+    return grouped[values].sum(min_count=1).reset_index()
+
+
+def _item_partials(df: pd.DataFrame) -> pd.DataFrame:
+    """Return per-item partial sums that can be combined across chunks.
+
+    Concatenate partials and pass them to _sum_by_item() to merge them, then to
+    _finish_items() for the final per-item rows.
+    """
+    if "Avg Price" in df.columns and "Quantity" in df.columns:
+        # Avg Price is not additive, so carry what _finish_items needs to rebuild it
+        price_x_qty = df["Avg Price"] * df["Quantity"]
+        df = df.drop(columns="Avg Price").assign(
+            _price_x_qty=price_x_qty,
+            _price_sum=df["Avg Price"],
+            _price_n=df["Avg Price"].notna().astype(np.int64),
+            _complete=price_x_qty.notna().astype(np.int64),
+            _rows=np.int64(1),
+        )
+    keep = [c for c in df.columns if c in MENU_COLUMNS or c.startswith("_")]
+    return _sum_by_item(df[keep])
+
+
+def _finish_items(parts: pd.DataFrame) -> pd.DataFrame:
+    """Turn combined _item_partials() output into one row per item."""
+    out = parts.copy()
+    if "_rows" in out.columns:
+        # Weight Avg Price by quantity where rows were merged and every merged row has
+        # both a price and a quantity; otherwise use the plain mean of the prices
+        rows = out.pop("_rows")
+        weighted = out.pop("_price_x_qty") / out["Quantity"]
+        use_weighted = (rows > 1) & (out.pop("_complete") == rows) & (out["Quantity"] != 0)
+        mean = out.pop("_price_sum") / out.pop("_price_n").where(lambda n: n > 0)
+        out["Avg Price"] = weighted.where(use_weighted, mean)
+
+    return out[[c for c in MENU_COLUMNS if c in out.columns]]
+
+
+def aggregate_items(df: pd.DataFrame) -> pd.DataFrame:
+    """Collapse repeated rows into one row per item, summing the sales columns."""
+    return _finish_items(_item_partials(df))
+
+
+def _concat_menu_frames(frames):
+    """Concatenate menu frames, keeping the category columns categorical."""
+    # Empty frames (header-only exports, weeks with no sales) add no rows but can
+    # carry object dtypes that would widen the numeric columns
+    frames = [part for part in frames if len(part)] or frames[:1]
+    df = pd.concat(frames, ignore_index=True)
+    # concat only keeps a categorical when every frame has the same categories,
+    # so rebuild those columns from the union of the per-frame categories
+    for col in df.columns:
+        parts = [part[col] for part in frames if col in part.columns]
+        if len(parts) == len(frames) and all(isinstance(p.dtype, pd.CategoricalDtype) for p in parts):
+            df[col] = union_categoricals(parts, sort_categories=True)
+
+    return df
 
-    if not all_dfs:
+
+def _write_cache(df, cache_path):
+    """Write a parsed week to its Parquet cache file, replacing it atomically."""
+    # Write to a temp file in the same folder first, so an interrupted run never
+    # leaves a truncated cache file behind
+    try:
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(cache_path) or ".", suffix=".parquet.tmp"
+        )
+    except OSError:
+        return  # read-only data folder: load without caching
+    os.close(fd)
+    try:
+        df.to_parquet(tmp_path, engine="pyarrow", compression="zstd", index=False)
+        os.replace(tmp_path, cache_path)
+    except (OSError, pa.ArrowException):
+        os.remove(tmp_path)
+
+
+def _load_one(csv_path, chunksize=None, cache=True):
+    """Load one menu-breakdown CSV as per-item rows tagged with its week."""
+    # Parsed weeks are cached in a sibling Parquet file, reused while newer than the CSV
+    cache_path = os.path.splitext(csv_path)[0] + ".parquet"
+    cache = cache and _HAS_PYARROW
+    df = None
+    if cache and os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(csv_path):
+        try:
+            df = pd.read_parquet(cache_path, engine="pyarrow")
+        except (OSError, pa.ArrowException):
+            df = None  # damaged cache file: parse the CSV and rewrite it
+    if df is None:
+        # Only read the columns we use, drop totals and pre-sum items per file, before the concat
+        if chunksize is None:
+            df = aggregate_items(drop_total_rows(normalize_menu_df(read_menu_csv(csv_path))))
+        else:
+            # Stream the file: only one chunk plus the per-item partial sums are held in memory
+            with read_menu_csv(csv_path, chunksize=chunksize) as chunks:
+                partials = [_item_partials(drop_total_rows(normalize_menu_df(chunk))) for chunk in chunks]
+            df = _finish_items(_sum_by_item(_concat_menu_frames(partials)))
+
+        if cache:
+            _write_cache(df, cache_path)
+    # filename as label, stored as a one-category categorical rather than a string per row
+    week = os.path.splitext(os.path.basename(csv_path))[0]
+    df["Week"] = pd.Categorical.from_codes(np.zeros(len(df), dtype=np.int8), categories=[week])
+    return df
+
+
+def load_all_weeks(base_path, chunksize=None, cache=True):
+    """Load all menu-breakdown CSVs from week subfolders, without total rows.
+
+    Pass chunksize to stream each CSV in chunks of that many rows, for exports
+    too large to read into memory at once. When pyarrow is installed, each
+    parsed week is cached as a Parquet file next to its CSV; pass cache=False
+    to always parse the CSVs.
+    """
+    
+    # Load any menu-breakdown CSVs directly in base_path
+    csv_paths = find_menu_csvs_in_folder(base_path)
+    if not csv_paths:
         return pd.DataFrame()
 
-    return pd.concat(all_dfs, ignore_index=True)
+    # The CSV parsers release the GIL, so files are read in parallel threads
+    with ThreadPoolExecutor(max_workers=min(8, len(csv_paths))) as pool:
+        all_dfs = list(pool.map(partial(_load_one, chunksize=chunksize, cache=cache), csv_paths))
+
+    return _concat_menu_frames(all_dfs)
+
+
+# Per-item totals, grouped once and shared by the item reports
+def summarize_items(df):
+    """Return total quantity and net sales per item."""
+    # min_count=1 keeps an item with no recorded values missing instead of 0
+    return (
+        df.groupby("Item Name", as_index=False, observed=True)[["Quantity", "Net Sales"]]
+          .sum(min_count=1)
+    )
 
 
 # Top n items by quantity sold
-def top_items_by_quantity(df, n=10):
-    """Return top n items by quantity sold."""
+def top_items_by_quantity(df, n=10, totals=False):
+    """Return top n items by quantity sold; pass totals=True for summarize_items() output."""
     return (
-        df.groupby("Item Name", as_index=False)["Quantity"]
-          .sum()
-          .sort_values("Quantity", ascending=False)
-          .head(n)
+        (df if totals else summarize_items(df))[["Item Name", "Quantity"]]
+          .nlargest(n, "Quantity")
     )
 
 
 # Top n items by revenue (Net Sales)
-def top_items_by_revenue(df, n=10):
-    """Return top n items by net sales revenue."""
+def top_items_by_revenue(df, n=10, totals=False):
+    """Return top n items by net sales revenue; pass totals=True for summarize_items() output."""
     return (
-        df.groupby("Item Name", as_index=False)["Net Sales"]
-          .sum()
-          .sort_values("Net Sales", ascending=False)
-          .head(n)
+        (df if totals else summarize_items(df))[["Item Name", "Net Sales"]]
+          .nlargest(n, "Net Sales")
+    )
+
+
+def _conn(db_path):
+    """Return this thread's shared SQLite connection for db_path."""
+    # sqlite3 connections may only be used by the thread that opened them
+    return _thread_conn(db_path, threading.get_ident())
+
+
+@lru_cache(maxsize=16)
+def _thread_conn(db_path, thread_id):
+    """Open and tune a SQLite connection once per (db_path, thread)."""
+    conn = sqlite3.connect(db_path)
+    conn.executescript(
+        "PRAGMA synchronous=NORMAL; PRAGMA cache_size=-64000; PRAGMA temp_store=MEMORY;"
     )
+    return conn
+
+
+def _sqlite_type(dtype):
+    """Map a pandas dtype to a SQLite column type."""
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    return "TEXT"
 
 
 def save_to_database(df, db_path="Projects\\ToastMetrics\\toastmetrics.db"):
     """Save DataFrame to SQLite database."""
-    conn = sqlite3.connect(db_path)
-    df.to_sql("sales", conn, if_exists="replace", index=False)
-    conn.close()
+    columns = ", ".join(
+        '"{}" {}'.format(col.replace('"', '""'), _sqlite_type(dtype))
+        for col, dtype in df.dtypes.items()
+    )
+    placeholders = ", ".join("?" * len(df.columns))
+    # Plain Python values with None for missing cells, which sqlite3 binds directly
+    rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+
+    conn = _conn(db_path)
+    # WAL with synchronous=NORMAL only syncs at checkpoints, so the bulk reload skips
+    # the per-transaction fsync. journal_mode=WAL is stored in the database file, so
+    # only the writer sets it; plain reads leave the file's mode alone.
+    conn.execute("PRAGMA journal_mode=WAL")
+    with conn:
+        conn.execute("BEGIN")
+        conn.execute("DROP TABLE IF EXISTS sales")
+        conn.execute(f"CREATE TABLE sales ({columns})")
+        conn.executemany(f"INSERT INTO sales VALUES ({placeholders})", rows)
+        # Build indexes after the bulk insert; the composite one serves
+        # "WHERE [Sales Category] = ? GROUP BY [Item Name]" without a temp sort
+        if "Sales Category" in df.columns and "Item Name" in df.columns:
+            conn.execute('CREATE INDEX idx_sales_category_item ON sales ("Sales Category", "Item Name")')
+        if "Item Name" in df.columns:
+            conn.execute('CREATE INDEX idx_sales_item ON sales ("Item Name")')
+        conn.execute("ANALYZE sales")
     print(f"Data saved to {db_path}")
 
 
-def bottom_items_by_quantity(df, n=10):
-    """Return bottom n items by quantity sold (poor performers)."""
+def bottom_items_by_quantity(df, n=10, totals=False):
+    """Return bottom n items by quantity sold (poor performers); pass totals=True for summarize_items() output."""
     return (
-        df.groupby("Item Name", as_index=False)["Quantity"]
-          .sum()
-          .sort_values("Quantity", ascending=True)
-          .head(n)
+        (df if totals else summarize_items(df))[["Item Name", "Quantity"]]
+          .nsmallest(n, "Quantity")
     )
 
 
@@ -103,47 +370,68 @@ def bottom_items_by_category(df, category="Food", n=10):
     """Return bottom n items by quantity for a specific category."""
     filtered = df[df["Sales Category"] == category]
     return (
-        filtered.groupby("Item Name", as_index=False)["Quantity"]
-          .sum()
-          .sort_values("Quantity", ascending=True)
-          .head(n)
+        filtered.groupby("Item Name", as_index=False, observed=True)["Quantity"]
+          .sum(min_count=1)
+          .nsmallest(n, "Quantity")
     )
 
 
 def query_database(query, db_path="toastmetrics.db"):
     """Run a SQL query and return results as DataFrame."""
-    conn = sqlite3.connect(db_path)
-    result = pd.read_sql_query(query, conn)
-    conn.close()
-    return result
+    return pd.read_sql_query(query, _conn(db_path))
+
+
+def run_sql_reports(db_path="Projects\\ToastMetrics\\toastmetrics.db", n=10, category="Food"):
+    """Run the item reports against the sales table, all over one connection."""
+    conn = _conn(db_path)
+    # Items with no recorded value are left out, as nlargest/nsmallest do in pandas;
+    # SQLite would otherwise sort their NULL totals first in ASC order
+    top = """
+        SELECT [Item Name], SUM([{col}]) AS [{col}]
+        FROM sales
+        GROUP BY [Item Name]
+        HAVING SUM([{col}]) IS NOT NULL
+        ORDER BY [{col}] {order}, [Item Name]
+        LIMIT ?
+    """
+    reports = [
+        (f"TOP {n} SELLERS (by quantity)", top.format(col="Quantity", order="DESC"), (n,)),
+        (f"TOP {n} BY REVENUE", top.format(col="Net Sales", order="DESC"), (n,)),
+        (f"BOTTOM {n} (poor performers)", top.format(col="Quantity", order="ASC"), (n,)),
+        (
+            f"BOTTOM {n} {category.upper()} ITEMS",
+            """
+                SELECT [Item Name], SUM(Quantity) AS Quantity
+                FROM sales
+                WHERE [Sales Category] = ?
+                GROUP BY [Item Name]
+                HAVING SUM(Quantity) IS NOT NULL
+                ORDER BY Quantity ASC, [Item Name]
+                LIMIT ?
+            """,
+            (category, n),
+        ),
+    ]
+    return {title: pd.read_sql_query(sql, conn, params=params) for title, sql, params in reports}
 
 
 if __name__ == "__main__":
     base = os.path.join("Projects", "ToastMetrics", "ToastMetrics_data", "2025-12")
-    df = load_all_weeks(base)
+    # Totals are already filtered out while loading
+    item_df = load_all_weeks(base)
     
-    if df.empty:
+    if item_df.empty:
         print("No data loaded - check folder path / file names.")
         raise SystemExit
     
-    # Filter out totals
-    item_df = df[~df["Item Name"].str.contains("total", case=False, na=False)]
-    
     # Save to database
-    save_to_database(item_df)
-    
-    # Reports
-    print("\n=== TOP 10 SELLERS (by quantity) ===")
-    print(top_items_by_quantity(item_df))
+    db_path = "Projects\\ToastMetrics\\toastmetrics.db"
+    save_to_database(item_df, db_path)
     
-    print("\n=== TOP 10 BY REVENUE ===")
-    print(top_items_by_revenue(item_df))
-    
-    print("\n=== BOTTOM 10 (poor performers) ===")
-    print(bottom_items_by_quantity(item_df))
-
-    print("\n=== BOTTOM 10 FOOD ITEMS ===")
-    print(bottom_items_by_category(item_df, "Food"))
+    # Reports run as SQL against the indexed table, on the same connection as the save
+    for title, report in run_sql_reports(db_path).items():
+        print(f"\n=== {title} ===")
+        print(report)
 
     # Demonstrate SQL query capability
     print("\n=== SQL QUERY: Top 5 Food Items by Revenue ===")
@@ -155,4 +443,4 @@ if __name__ == "__main__":
         ORDER BY Total_Revenue DESC
         LIMIT 5
     """
-    print(query_database(sql, db_path="Projects\\ToastMetrics\\toastmetrics.db"))
+    print(query_database(sql, db_path=db_path))